@@ -0,0 +1,200 @@
+import asyncio
+import inspect
+import json
+import time
+from loguru import logger
+
+# 工具调用循环：执行模型返回的 tool_calls，将结果回填给模型，直到模型给出最终回答
+
+# 缓存未命中的标记, 与工具返回的 None 区分
+MISSING = object()
+
+def _get(obj, key, default=None):
+    """兼容 dict 与 openai SDK 返回对象的字段读取"""
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+def _is_async(func):
+    """协程函数, 或 __call__ 为协程函数的可调用对象"""
+    return inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, "__call__", None))
+
+class ToolCache():
+    """
+    工具结果缓存
+
+    Args:
+        ttl (float): 缓存有效期(秒), None 表示永久有效
+        maxsize (int): 最大缓存条目数
+    """
+    def __init__(self, ttl : float = 300.0, maxsize : int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+
+    @staticmethod
+    def key(name : str, arguments : dict):
+        return name + ":" + json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+
+    def get(self, key : str):
+        """返回缓存值, 未命中或已过期时返回 MISSING"""
+        item = self._data.get(key)
+        if item is None:
+            return MISSING
+        expire, value = item
+        if expire is not None and expire < time.monotonic():
+            del self._data[key]
+            return MISSING
+        return value
+
+    def set(self, key : str, value):
+        if len(self._data) >= self.maxsize:
+            # 淘汰最早写入的条目
+            self._data.pop(next(iter(self._data)))
+        expire = None if self.ttl is None else time.monotonic() + self.ttl
+        self._data[key] = (expire, value)
+
+class Tool():
+    """
+    工具定义
+
+    Args:
+        name (str): 工具名称, 与 tools 定义中的 function.name 一致
+        func (callable): 工具实现, 可以是普通函数或协程函数, 以关键字参数接收 arguments
+        timeout (float): 单次调用超时(秒)。同步工具在线程中执行, 超时后只是不再等待结果,
+            线程会继续运行到结束; 需要真正中断的工具请实现为协程函数
+        cacheable (bool): 相同参数的结果是否可以缓存
+    """
+    def __init__(self, name : str, func, timeout : float = 30.0, cacheable : bool = True):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.cacheable = cacheable
+
+    async def __call__(self, arguments : dict):
+        if _is_async(self.func):
+            return await self.func(**arguments)
+        # 同步工具放到线程中执行，避免阻塞事件循环
+        return await asyncio.to_thread(self.func, **arguments)
+
+class AgentLoop():
+    """
+    工具调用编排循环
+
+    Args:
+        create (callable): 模型调用函数, 如 client.chat.completions.create, 同步或异步均可
+        tools (list[Tool]): 可用工具
+        tool_specs (list): 提交给模型的 tools 定义
+        max_iterations (int): 最大模型调用轮数
+        cache (ToolCache): 工具结果缓存, 多次 run 之间共享
+        **create_kwargs: 透传给 create 的其他参数, 如 model, temperature
+    """
+    def __init__(self, create, tools : list, tool_specs : list, max_iterations : int = 5, cache : ToolCache = None, **create_kwargs):
+        self.create = create
+        self.tools = {tool.name: tool for tool in tools}
+        self.tool_specs = tool_specs
+        self.max_iterations = max_iterations
+        self.cache = cache if cache is not None else ToolCache()
+        self.create_kwargs = create_kwargs
+
+    async def _complete(self, messages : list):
+        kwargs = dict(self.create_kwargs, messages=messages)
+        # OpenAI 兼容接口不接受空的 tools 列表
+        if self.tool_specs:
+            kwargs["tools"] = self.tool_specs
+        if _is_async(self.create):
+            return await self.create(**kwargs)
+        return await asyncio.to_thread(self.create, **kwargs)
+
+    async def _execute(self, tool_call, inflight : dict):
+        """
+        执行单个工具调用，返回回填给模型的 tool 消息
+
+        Args:
+            tool_call: 模型返回的工具调用
+            inflight (dict): 本轮正在执行的调用, 相同参数的可缓存调用共享同一个 task
+        """
+        function = _get(tool_call, "function")
+        name = _get(function, "name")
+        tool_call_id = _get(tool_call, "id")
+        try:
+            arguments = json.loads(_get(function, "arguments") or "{}")
+        except json.JSONDecodeError as e:
+            return self._tool_message(tool_call_id, name, self._serialize({"error": f"参数解析错误: {str(e)}"}))
+
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._tool_message(tool_call_id, name, self._serialize({"error": f"未知工具: {name}"}))
+
+        if not tool.cacheable:
+            return self._tool_message(tool_call_id, name, await self._invoke(tool, arguments, None))
+
+        key = ToolCache.key(name, arguments)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            logger.info(f"工具 {name} 命中缓存")
+            return self._tool_message(tool_call_id, name, cached)
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.ensure_future(self._invoke(tool, arguments, key))
+        return self._tool_message(tool_call_id, name, await task)
+
+    async def _invoke(self, tool : Tool, arguments : dict, key : str):
+        """调用工具并序列化结果, 只有成功的结果会写入缓存"""
+        try:
+            result = await asyncio.wait_for(tool(arguments), timeout=tool.timeout)
+            content = self._serialize(result)
+        except asyncio.TimeoutError:
+            logger.warning(f"工具 {tool.name} 调用超时 ({tool.timeout}s)")
+            return self._serialize({"error": f"工具调用超时: {tool.timeout}s"})
+        except Exception as e:
+            logger.error(f"工具 {tool.name} 调用错误: {str(e)}")
+            return self._serialize({"error": f"工具调用错误: {str(e)}"})
+
+        if key is not None:
+            self.cache.set(key, content)
+        return content
+
+    @staticmethod
+    def _serialize(result):
+        # 无法直接编码的值(如 datetime)按 str 输出
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _tool_message(tool_call_id : str, name : str, content : str):
+        return {"role": "tool", "tool_call_id": tool_call_id, "name": name, "content": content}
+
+    async def run(self, messages : list):
+        """
+        运行工具调用循环
+
+        Args:
+            messages (list): 初始对话消息, 循环过程中会被追加
+
+        Returns:
+            最后一次模型返回的 message
+        """
+        for iteration in range(self.max_iterations):
+            completion = await self._complete(messages)
+            choice = _get(completion, "choices")[0]
+            message = _get(choice, "message")
+            tool_calls = _get(message, "tool_calls")
+            if _get(choice, "finish_reason") != "tool_calls" or not tool_calls:
+                return message
+
+            messages.append(message)
+            logger.info(f"第 {iteration+1} 轮: 并发执行 {len(tool_calls)} 个工具调用")
+            # 同一轮的工具调用并发执行，结果按 tool_calls 原顺序回填
+            inflight = {}
+            results = await asyncio.gather(*(self._execute(tool_call, inflight) for tool_call in tool_calls))
+            messages.extend(results)
+
+        raise RuntimeError(f"工具调用超过最大轮数: {self.max_iterations}")
+
+async def search(query : str):
+    """
+    本地搜索工具(占位实现)，返回网站标题、地址和简介
+    """
+    return [
+        {"title": query, "url": "", "description": f"未接入搜索引擎，无法检索: {query}"}
+    ]
@@ -2,28 +2,25 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from loguru import logger
-import httpx
-import toml
-import os
-from dotenv import load_dotenv
 import asyncio  
 import json
-
-# 加载环境变量
-load_dotenv()
-api_key = os.getenv("API_KEY")
-print(api_key)
-# 加载配置文件
-config = toml.load("config.toml")
-
-# 配置日志
-logger.add(
-    "logs/app.log",
-    rotation=config["log"]["rotation"],
-    level=config["log"]["level"]
-)
-
-app = FastAPI()
+from contextlib import asynccontextmanager
+from settings import get_settings
+
+@asynccontextmanager
+async def lifespan(app):
+    # 配置日志
+    settings = get_settings()
+    handler_id = logger.add(
+        "logs/app.log",
+        rotation=settings.log.rotation,
+        level=settings.log.level
+    )
+    yield
+    # 每次启动都会添加 sink, 关闭时移除, 避免重复写日志
+    logger.remove(handler_id)
+
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -42,30 +39,32 @@ class ConstitutionRequest(BaseModel):
 
 async def call_model(messages, retry_count=2):
     """调用模型API，支持重试"""
+    import httpx
 
-    if not api_key:
+    settings = get_settings()
+    if not settings.api_key:
         raise HTTPException(status_code=500, detail="API key not found")
 
     headers = {
-        "Authorization": f"Bearer {api_key}",
+        "Authorization": f"Bearer {settings.api_key}",
         "Content-Type": "application/json"
     }
     
     data = {
-        "model": config["model"]["name"],
+        "model": settings.model.name,
         "messages": messages,
-        "temperature": config["model"]["temperature"]
+        "temperature": settings.model.temperature
     }
 
     # 获取API URL，确保去除可能的尾部空格
-    api_url = config["model"]["url"].strip()
+    api_url = settings.model.url.strip()
     logger.info(f"API URL: {api_url}")
 
     for attempt in range(retry_count + 1):
         async with httpx.AsyncClient(timeout=60.0) as client:
             try:
                 logger.info(f"Attempt {attempt+1}/{retry_count+1} - sending request to model API: {api_url}")
-                logger.info(f"using model: {config['model']['name']}")
+                logger.info(f"using model: {settings.model.name}")
                 
                 # 先尝试ping域名，检查连接性
                 try:
@@ -152,7 +151,7 @@ async def translate(request: TranslationRequest):
         # 以下代码可能不需要了，因为我们已经在上面返回了结果
         # 第二次调用：格式化为JSON
         # second_messages = [
-        #     {"role": "system", "content": config["prompt"]["prompt_content"]},
+        #     {"role": "system", "content": get_settings().prompt.prompt_content},
         #     {"role": "user", "content": json.dumps(data)}
         # ]
         # second_response = await call_model(second_messages)
@@ -278,9 +277,10 @@ async def constitution_analysis(request: TranslationRequest):
 
 if __name__ == "__main__":
     import uvicorn
+    settings = get_settings()
     uvicorn.run(
         "app:app",
-        host=config["server"]["host"],
-        port=config["server"]["port"],
+        host=settings.server.host,
+        port=settings.server.port,
         reload=True
     )
\ No newline at end of file
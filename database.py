@@ -1,6 +1,8 @@
+import asyncio
 import pymongo
 import toml
 from openai import OpenAI
+from agent import AgentLoop, Tool, search
 
 """ config = toml.load("config.toml")
 
@@ -43,14 +45,19 @@ tools = [
 	},
 ]
 
-completion = client.chat.completions.create(
-    model="moonshot-v1-8k",
-    messages=[
+async def main():
+    loop = AgentLoop(
+        client.chat.completions.create,
+        tools=[Tool("search", search)],
+        tool_specs=tools,
+        model="moonshot-v1-8k",
+        temperature=0.3,
+    )
+    message = await loop.run([
         {"role": "system", "content": "你是 Kimi，由 Moonshot AI 提供的人工智能助手，你更擅长中文和英文的对话。你会为用户提供安全，有帮助，准确的回答。同时，你会拒绝一切涉及恐怖主义，种族歧视，黄色暴力等问题的回答。Moonshot AI 为专有名词，不可翻译成其他语言。"},
         {"role": "user", "content": "请联网搜索 Context Caching，并告诉我它是什么。"} # 在提问中要求 Kimi 大模型联网搜索
-    ],
-    temperature=0.3,
-    tools=tools, # <-- 我们通过 tools 参数，将定义好的 tools 提交给 Kimi 大模型
-)
- 
-print(completion.choices[0].model_dump_json(indent=4))
+    ])
+    print(message.content)
+
+if __name__ == "__main__":
+    asyncio.run(main())
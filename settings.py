@@ -0,0 +1,56 @@
+import os
+from functools import lru_cache
+from typing import Optional
+import toml
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+# 配置对象：config.toml 与 .env 只在第一次调用 get_settings() 时加载
+
+class ModelSettings(BaseModel):
+    name: str
+    url: str
+    temperature: float = 0.7
+
+class ServerSettings(BaseModel):
+    host: str = "0.0.0.0"
+    port: int = 7777
+
+class LogSettings(BaseModel):
+    level: str = "INFO"
+    rotation: str = "10 MB"
+
+class MongoSettings(BaseModel):
+    host: str = "mongodb://localhost:27017/"
+    db: str = "test"
+    user_name: str = "test"
+
+class EmbeddingSettings(BaseModel):
+    model: str = "BAAI/bge-m3"
+
+class PromptSettings(BaseModel):
+    prompt_content: str = ""
+    word_translate_prompt: str = ""
+    simple_prompt: str = ""
+    filter: Optional[str] = None
+    intergrate: Optional[str] = None
+
+class Settings(BaseModel):
+    api_key: Optional[str] = None
+    model: ModelSettings
+    server: ServerSettings = ServerSettings()
+    log: LogSettings = LogSettings()
+    mongodb: MongoSettings = MongoSettings()
+    embedding: EmbeddingSettings = EmbeddingSettings()
+    prompt: PromptSettings = PromptSettings()
+
+@lru_cache(maxsize=None)
+def get_settings(path : str = "config.toml") -> Settings:
+    """
+    加载配置, 结果会被缓存
+
+    Args:
+        path (str): 配置文件路径
+    """
+    load_dotenv()
+    return Settings(api_key=os.getenv("API_KEY"), **toml.load(path))
@@ -16,16 +16,22 @@ class CallModel():
         self.rate = rate
         self.prompt = prompt
 
-import os
+import csv
+import time
+import uuid
 import asyncio
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import Executor, ThreadPoolExecutor
 from fastapi import HTTPException
+from loguru import logger
+from settings import get_settings
 
-def sendrequest():
+def sendrequest(*args):
     """
     发送请求
     """
     pass
-config = os.getenv("config")
 
 class CSVFILE():
     def __init__(self, file : str):
@@ -48,7 +54,7 @@ async def fitered_module(CSVFILE_ : CSVFILE, rate : float, prompt : str):
     数据筛选模块
     """ 
     try:
-        sendrequest(config["prompt"]["filter"], CSVFILE_, rate, prompt)
+        sendrequest(get_settings().prompt.filter, CSVFILE_, rate, prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"filtered_module:API调用错误: {str(e)}")
     return Response("success", CSVFILE_)
@@ -58,47 +64,293 @@ async def intergrate_module(CSVFILE_ : CSVFILE, rate : float, prompt : str):
     数据整合模块
     """
     try:
-        sendrequest(config["prompt"]["intergrate"], CSVFILE_, rate, prompt)
+        sendrequest(get_settings().prompt.intergrate, CSVFILE_, rate, prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"intergrate_moduel_调用错误: {str(e)}")
     return Response("success", CSVFILE_)
 
 
 class status():
-    def __init__(self, status : str):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, status : str = PENDING):
         self.status = status
+    def done(self):
+        return self.status in (status.SUCCESS, status.FAILED, status.CANCELLED)
+
 class Command():
-    def __init__(self, status : status, CSVFILE : CSVFILE):
+    """
+    命令数据结构
+
+    Args:
+        status (status): 命令状态
+        CSVFILE (CSVFILE): CSV文件
+        kind (str): 命令类型, filter / intergrate / compress
+        rate (float): 过滤强度或压缩率
+        prompt (str): 提示
+    """
+    def __init__(self, status : status, CSVFILE : CSVFILE, kind : str = "filter", rate : float = 1.0, prompt : str = ""):
+        self.id = uuid.uuid4().hex
         self.status = status
         self.CSVFILE = CSVFILE
+        self.kind = kind
+        self.rate = rate
+        self.prompt = prompt
+        self.result = None
+        self.error = None
+        self.submitted_at = None
+        self.started_at = None
+        self.finished_at = None
+
+def _read_csv(CSVFILE_ : CSVFILE):
+    with open(CSVFILE_.file, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+# 命令处理函数在线程池/进程池中执行, 只接收 Command 并返回 Response,
+# 不修改共享状态, 因此也可以交给 ProcessPoolExecutor
+def filter_handler(Command_ : Command):
+    rows = _read_csv(Command_.CSVFILE)
+    sendrequest(get_settings().prompt.filter, rows, Command_.rate, Command_.prompt)
+    return Response("success", Command_.CSVFILE)
+
+def intergrate_handler(Command_ : Command):
+    rows = _read_csv(Command_.CSVFILE)
+    sendrequest(get_settings().prompt.intergrate, rows, Command_.rate, Command_.prompt)
+    return Response("success", Command_.CSVFILE)
+
+def compress_handler(Command_ : Command):
+    rows = _read_csv(Command_.CSVFILE)
+    embeddings = compress_texts([" ".join(row.values()) for row in rows])
+    return Response(embeddings, Command_.CSVFILE)
+
 class MCP_Server():
-    def __init__(self, Command : Command):
+    """
+    MCP命令调度器: 命令入队后由 dispatcher 按 kind 分发到处理函数, 在 executor 中执行
+
+    Args:
+        Command (Command): 初始命令, 启动后自动提交
+        workers (int): 并发执行的命令数
+        executor (Executor): 执行器, 默认线程池; CPU密集的CSV处理可传入 ProcessPoolExecutor
+        latency_window (int): 统计延迟时保留的最近命令数
+        history (int): 已结束但未被 wait() 取走的命令最多保留条数
+    """
+    def __init__(self, Command : Command = None, workers : int = 4, executor : Executor = None, latency_window : int = 1000, history : int = 1000):
         self.Command = Command
+        self.workers = workers
+        # 未传入 executor 时由 start() 创建默认线程池, stop() 之后可以重新 start()
+        self.executor = executor
+        self._own_executor = executor is None
+        self._closed = False
+        self.handlers = {
+            "filter": filter_handler,
+            "intergrate": intergrate_handler,
+            "compress": compress_handler,
+        }
+        self.commands = {}
+        self._queue = None
+        self._tasks = []
+        self._running = {}
+        self._done = {}
+        self._finished = deque()
+        self._history = history
+        self._latency = deque(maxlen=latency_window)
+        self._counts = {"submitted": 0, status.SUCCESS: 0, status.FAILED: 0, status.CANCELLED: 0}
+        self._started_at = None
+        # 之前各次 start/stop 之间累计的运行时间, 与累计的计数器一起计算吞吐量
+        self._uptime = 0.0
+
+    def register(self, kind : str, handler):
+        """注册命令处理函数"""
+        self.handlers[kind] = handler
+
+    async def start(self):
+        if self._tasks:
+            return
+        if self._closed:
+            if not self._own_executor:
+                raise RuntimeError("MCP_Server: 传入的 executor 已在 stop() 中关闭, 无法重新启动")
+            self.executor = None
+            self._closed = False
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue()
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        if self.Command is not None:
+            Command_, self.Command = self.Command, None
+            await self.submit(Command_)
+
+    async def stop(self, wait : bool = True):
+        """停止调度; wait 为 False 时未完成的命令会被标记为取消"""
+        if wait and self._queue is not None:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._started_at is not None:
+            self._uptime += time.monotonic() - self._started_at
+            self._started_at = None
+        for Command_ in list(self.commands.values()):
+            if not Command_.status.done():
+                self._finish(Command_, status.CANCELLED)
+        self._running.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._closed = True
+
+    async def submit(self, Command_ : Command):
+        """命令入队, 返回命令id"""
+        if Command_.kind not in self.handlers:
+            raise ValueError(f"未知命令类型: {Command_.kind}")
+        await self.start()
+        Command_.status = status(status.PENDING)
+        Command_.submitted_at = time.monotonic()
+        self.commands[Command_.id] = Command_
+        self._done[Command_.id] = asyncio.Event()
+        self._counts["submitted"] += 1
+        await self._queue.put(Command_)
+        return Command_.id
+
+    async def wait(self, Command_ : Command):
+        """等待命令结束, 返回命令自身; 结束后服务端不再保留该命令"""
+        event = self._done.get(Command_.id)
+        if event is not None:
+            await event.wait()
+        self._forget(Command_.id)
+        return Command_
+
+    def cancel(self, command_id : str):
+        """
+        取消命令: 排队中的命令不会再执行; 执行中的命令在线程池中无法中断, 其结果会被丢弃
+        """
+        Command_ = self.commands.get(command_id)
+        if Command_ is None or Command_.status.done():
+            return False
+        future = self._running.get(command_id)
+        if future is not None:
+            future.cancel()
+        self._finish(Command_, status.CANCELLED)
+        return True
+
     def run(self, Command : Command):
-        pass
+        """在当前线程中同步执行命令"""
+        Command.started_at = time.monotonic()
+        Command.submitted_at = Command.submitted_at or Command.started_at
+        Command.status = status(status.RUNNING)
+        try:
+            Command.result = self.handlers[Command.kind](Command)
+        except Exception as e:
+            Command.error = str(e)
+            Command.status = status(status.FAILED)
+            raise
+        Command.status = status(status.SUCCESS)
+        return Command.result
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            Command_ = await self._queue.get()
+            try:
+                if Command_.status.done():
+                    continue
+                Command_.status = status(status.RUNNING)
+                Command_.started_at = time.monotonic()
+                try:
+                    future = loop.run_in_executor(self.executor, self.handlers[Command_.kind], Command_)
+                except Exception as e:
+                    # executor 已关闭或进程池损坏时, 命令直接失败, dispatcher 继续运行
+                    self._fail(Command_, e)
+                    continue
+                self._running[Command_.id] = future
+                # 用 asyncio.wait 而不是 await future, 取消命令时不会取消 dispatcher 本身
+                await asyncio.wait([future])
+                self._running.pop(Command_.id, None)
+                if Command_.status.done():
+                    continue
+                if future.exception() is not None:
+                    self._fail(Command_, future.exception())
+                else:
+                    Command_.result = future.result()
+                    self._finish(Command_, status.SUCCESS)
+            finally:
+                self._queue.task_done()
+
+    def _fail(self, Command_ : Command, error : BaseException):
+        Command_.error = str(error)
+        logger.error(f"MCP_Server: 命令 {Command_.id} ({Command_.kind}) 执行失败: {Command_.error}")
+        self._finish(Command_, status.FAILED)
+
+    def _finish(self, Command_ : Command, result : str):
+        Command_.status = status(result)
+        Command_.finished_at = time.monotonic()
+        self._counts[result] += 1
+        if result != status.CANCELLED:
+            self._latency.append(Command_.finished_at - Command_.submitted_at)
+        self._done[Command_.id].set()
+        # 只保留最近 history 条已结束但还未被 wait() 取走的命令
+        self._finished.append(Command_.id)
+        while len(self._finished) > self._history:
+            self._forget(self._finished.popleft())
 
+    def _forget(self, command_id : str):
+        Command_ = self.commands.get(command_id)
+        if Command_ is not None and Command_.status.done():
+            del self.commands[command_id]
+            del self._done[command_id]
+
+    def stats(self):
+        """吞吐量与延迟统计, 延迟为入队到完成的时间(秒)"""
+        elapsed = self._uptime
+        if self._started_at is not None:
+            elapsed += time.monotonic() - self._started_at
+        latency = sorted(self._latency)
+        completed = self._counts[status.SUCCESS] + self._counts[status.FAILED]
+        return {
+            "submitted": self._counts["submitted"],
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "success": self._counts[status.SUCCESS],
+            "failed": self._counts[status.FAILED],
+            "cancelled": self._counts[status.CANCELLED],
+            "throughput": completed / elapsed if elapsed else 0.0,
+            "latency_avg": sum(latency) / len(latency) if latency else 0.0,
+            "latency_p50": latency[len(latency) // 2] if latency else 0.0,
+            "latency_p95": latency[int(len(latency) * 0.95)] if latency else 0.0,
+            "latency_max": latency[-1] if latency else 0.0,
+        }
 
 async def MCP_InTeract(Command_ : Command, MCP_Server_ : MCP_Server):
     """
     MCP交互
     """
     try:
-        MCP_Server_.run(Command_)
+        await MCP_Server_.submit(Command_)
+        await MCP_Server_.wait(Command_)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"MCP_InTeract:API调用错误: {str(e)}")
-    return Response("success", Command_.CSVFILE)
+    if Command_.status.status == status.FAILED:
+        raise HTTPException(status_code=500, detail=f"MCP_InTeract:API调用错误: {Command_.error}")
+    if Command_.status.status == status.CANCELLED:
+        raise HTTPException(status_code=409, detail=f"MCP_InTeract:命令已取消: {Command_.id}")
+    return Command_.result
 
-import pymongo
 async def data_compress(collecion : str , compress_rate : float , target : str):
     """
     数据压缩
     """
     try:
-        client = pymongo.MongoClient(config["mongodb"]["url"])
-        db = client[config["mongodb"]["db"]]
+        import pymongo
+        settings = get_settings()
+        client = pymongo.MongoClient(settings.mongodb.host)
+        db = client[settings.mongodb.db]
         col = db[collecion]
         target_col = db[target]
-        res = sendrequest(config["embedding"]["compress"], col, compress_rate)
+        res = sendrequest(settings.embedding.model, col, compress_rate)
         target_col.insert_many(res)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"data_compress:API调用错误: {str(e)}")
@@ -108,20 +360,28 @@ async def data_compress(collecion : str , compress_rate : float , target : str):
     return compress_res
 
 
-import torch
-from transformers import AutoTokenizer, AutoModel
-# 数据压缩：使用BAAI/bge-m3模型将病历文本转化为向量
-def compress_text(text):
-    model_name = "BAAI/bge-m3"
+@lru_cache(maxsize=None)
+def _load_embedding_model(model_name : str):
+    """首次使用时才导入 torch/transformers 并加载模型，之后复用"""
+    from transformers import AutoTokenizer, AutoModel
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     model = AutoModel.from_pretrained(model_name)
+    return tokenizer, model
+
+# 数据压缩：使用BAAI/bge-m3模型将病历文本转化为向量
+def compress_texts(texts : list):
+    """批量编码, 一次前向计算得到所有文本的向量"""
+    import torch
+    tokenizer, model = _load_embedding_model(get_settings().embedding.model)
     
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
+    inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
     with torch.no_grad():
         outputs = model(**inputs)
     # 获取文本的嵌入向量
-    text_embedding = outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
-    return text_embedding
+    return outputs.last_hidden_state.mean(dim=1).numpy()
+
+def compress_text(text):
+    return compress_texts([text])[0]
 
 class mysql():
     def __init__(self, host : str, user : str, password : str, database : str):
@@ -151,20 +411,10 @@ def retrieve_patient_data(patient_id):
     return result
     
 # 隐私计算：使用同态加密库进行隐私保护计算
-from homomorphic_encryption import HomomorphicEncryptor
-
-# 初始化同态加密器
-encryptor = HomomorphicEncryptor()
-
-# 用户数据
-user_data = {
-    "age": 30,
-    "blood_pressure": 120,
-    "cholesterol_level": 200
-}
-
-# 加密用户数据
-encrypted_data = {key: encryptor.encrypt(value) for key, value in user_data.items()}
+@lru_cache(maxsize=None)
+def _get_encryptor():
+    from homomorphic_encryption import HomomorphicEncryptor
+    return HomomorphicEncryptor()
 
 # 在加密数据上进行计算
 def calculate_health_score(encrypted_data):
@@ -172,12 +422,26 @@ def calculate_health_score(encrypted_data):
     health_score = (encrypted_data["blood_pressure"] + encrypted_data["cholesterol_level"]) / encrypted_data["age"]
     return health_score
 
-# 计算健康评分（直接在加密数据上操作）
-encrypted_health_score = calculate_health_score(encrypted_data)
+def privacy_demo():
+    # 初始化同态加密器
+    encryptor = _get_encryptor()
+
+    # 用户数据
+    user_data = {
+        "age": 30,
+        "blood_pressure": 120,
+        "cholesterol_level": 200
+    }
 
-# 解密结果
-health_score = encryptor.decrypt(encrypted_health_score)
-print(f"计算出的健康评分（隐私计算）：{health_score}")
+    # 加密用户数据
+    encrypted_data = {key: encryptor.encrypt(value) for key, value in user_data.items()}
+
+    # 计算健康评分（直接在加密数据上操作）
+    encrypted_health_score = calculate_health_score(encrypted_data)
+
+    # 解密结果
+    health_score = encryptor.decrypt(encrypted_health_score)
+    print(f"计算出的健康评分（隐私计算）：{health_score}")
 
 
 class PKISystem():
@@ -194,18 +458,24 @@ class IdentityAuthenticator():
 # 身份认证：使用PKI系统和身份认证库
 
 # 初始化PKI系统和身份认证器
-pki_system = PKISystem()
-authenticator = IdentityAuthenticator(pki_system)
-
-# 用户注册：生成唯一身份证书
-user_id = "user_12345"
-user_certificate = pki_system.generate_certificate(user_id)
+@lru_cache(maxsize=None)
+def _get_authenticator():
+    return IdentityAuthenticator(PKISystem())
 
 # 用户登录：验证身份
 def user_login(user_id, user_certificate):
-    if authenticator.verify_certificate(user_id, user_certificate):
+    if _get_authenticator().verify_certificate(user_id, user_certificate):
         print("身份认证成功！欢迎访问Ai病历库。")
         return True
     else:
         print("身份认证失败！访问被拒绝。")
-        return False
\ No newline at end of file
+        return False
+
+
+if __name__ == "__main__":
+    privacy_demo()
+
+    # 用户注册：生成唯一身份证书
+    user_id = "user_12345"
+    user_certificate = _get_authenticator().pki_system.generate_certificate(user_id)
+    user_login(user_id, user_certificate)
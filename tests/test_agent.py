@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+import json
+import time
+import pytest
+from agent import AgentLoop, Tool, ToolCache, MISSING
+
+def _tool_call(call_id : str, name : str, arguments):
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments)
+    return {"id": call_id, "function": {"name": name, "arguments": arguments}}
+
+def _completion(tool_calls=None, content=None):
+    finish_reason = "tool_calls" if tool_calls else "stop"
+    message = {"role": "assistant", "content": content, "tool_calls": tool_calls}
+    return {"choices": [{"finish_reason": finish_reason, "message": message}]}
+
+class ScriptedModel():
+    """按顺序返回预设的 completion, 并记录每次收到的 messages"""
+    def __init__(self, *completions):
+        self.completions = list(completions)
+        self.calls = []
+        self.kwargs = []
+
+    async def __call__(self, messages, **kwargs):
+        self.calls.append(list(messages))
+        self.kwargs.append(kwargs)
+        return self.completions.pop(0)
+
+def _run(loop : AgentLoop, messages=None):
+    messages = messages if messages is not None else [{"role": "user", "content": "hi"}]
+    return asyncio.run(loop.run(messages)), messages
+
+def _tool_messages(messages):
+    return [m for m in messages if m["role"] == "tool"]
+
+def test_tool_calls_run_concurrently_and_keep_order():
+    async def slow(n):
+        await asyncio.sleep(0.2 - n * 0.05)
+        return n
+    model = ScriptedModel(
+        _completion([_tool_call(str(n), "slow", {"n": n}) for n in range(3)]),
+        _completion(content="done"),
+    )
+    loop = AgentLoop(model, [Tool("slow", slow)], [])
+    start = time.monotonic()
+    message, messages = _run(loop)
+    assert time.monotonic() - start < 0.4
+    assert message["content"] == "done"
+    tools = _tool_messages(messages)
+    assert [m["tool_call_id"] for m in tools] == ["0", "1", "2"]
+    assert [m["content"] for m in tools] == ["0", "1", "2"]
+
+def test_errors_are_reported_to_model():
+    async def hang():
+        await asyncio.sleep(1)
+    model = ScriptedModel(
+        _completion([
+            _tool_call("a", "hang", {}),
+            _tool_call("b", "missing", {}),
+            _tool_call("c", "hang", "{not json"),
+        ]),
+        _completion(content="done"),
+    )
+    loop = AgentLoop(model, [Tool("hang", hang, timeout=0.05)], [])
+    _, messages = _run(loop)
+    errors = [json.loads(m["content"])["error"] for m in _tool_messages(messages)]
+    assert "超时" in errors[0]
+    assert "未知工具" in errors[1]
+    assert "参数解析错误" in errors[2]
+
+def test_unserializable_result_does_not_abort_run():
+    def now():
+        return {"at": datetime.datetime(2024, 1, 1)}
+    model = ScriptedModel(_completion([_tool_call("a", "now", {})]), _completion(content="done"))
+    message, messages = _run(AgentLoop(model, [Tool("now", now)], []))
+    assert message["content"] == "done"
+    assert "2024-01-01" in _tool_messages(messages)[0]["content"]
+
+def test_cache_hit_and_inflight_dedup():
+    calls = []
+    async def lookup(q):
+        calls.append(q)
+        await asyncio.sleep(0.01)
+        return None
+    model = ScriptedModel(
+        _completion([_tool_call("a", "lookup", {"q": 1}), _tool_call("b", "lookup", {"q": 1})]),
+        _completion([_tool_call("c", "lookup", {"q": 1})]),
+        _completion(content="done"),
+    )
+    loop = AgentLoop(model, [Tool("lookup", lookup)], [])
+    _, messages = _run(loop)
+    assert calls == [1]
+    assert [m["content"] for m in _tool_messages(messages)] == ["null"] * 3
+
+def test_failed_results_are_not_cached():
+    cache = ToolCache()
+    async def broken():
+        raise ValueError("boom")
+    model = ScriptedModel(_completion([_tool_call("a", "broken", {})]), _completion(content="done"))
+    _run(AgentLoop(model, [Tool("broken", broken)], [], cache=cache))
+    assert cache.get(ToolCache.key("broken", {})) is MISSING
+
+def test_max_iterations():
+    async def echo():
+        return "again"
+    model = ScriptedModel(*[_completion([_tool_call(str(i), "echo", {})]) for i in range(2)])
+    loop = AgentLoop(model, [Tool("echo", echo, cacheable=False)], [], max_iterations=2)
+    with pytest.raises(RuntimeError):
+        _run(loop)
+
+def test_tools_omitted_when_no_specs():
+    model = ScriptedModel(_completion(content="done"), _completion(content="done"))
+    _run(AgentLoop(model, [], [], model="m"))
+    specs = [{"type": "function", "function": {"name": "search"}}]
+    _run(AgentLoop(model, [], specs, model="m"))
+    assert model.kwargs[0] == {"model": "m"}
+    assert model.kwargs[1] == {"model": "m", "tools": specs}
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from show import CSVFILE, Command, MCP_Server, MCP_InTeract, Response, status
+
+def _command(kind : str = "echo"):
+    return Command(status(), CSVFILE("unused.csv"), kind=kind)
+
+def echo_handler(Command_ : Command):
+    return Response("ok", Command_.CSVFILE)
+
+def broken_handler(Command_ : Command):
+    raise ValueError("boom")
+
+def _server(**kwargs):
+    server = MCP_Server(**kwargs)
+    server.register("echo", echo_handler)
+    server.register("broken", broken_handler)
+    return server
+
+def test_commands_are_executed():
+    async def main():
+        server = _server(workers=2)
+        commands = [_command() for _ in range(5)]
+        for Command_ in commands:
+            await server.submit(Command_)
+        for Command_ in commands:
+            await server.wait(Command_)
+        await server.stop()
+        return server, commands
+    server, commands = asyncio.run(main())
+    assert all(c.status.status == status.SUCCESS for c in commands)
+    assert all(c.result.response == "ok" for c in commands)
+    assert server.stats()["success"] == 5
+
+def test_failure_is_reported():
+    async def main():
+        server = _server()
+        Command_ = _command("broken")
+        with pytest.raises(HTTPException) as exc:
+            await MCP_InTeract(Command_, server)
+        await server.stop()
+        return Command_, exc.value
+    Command_, exc = asyncio.run(main())
+    assert Command_.status.status == status.FAILED
+    assert Command_.error == "boom"
+    assert exc.status_code == 500
+
+def test_unknown_kind_is_rejected():
+    async def main():
+        server = _server()
+        with pytest.raises(ValueError):
+            await server.submit(_command("missing"))
+    asyncio.run(main())
+
+def test_cancel_queued_and_running():
+    release = threading.Event()
+    def blocking_handler(Command_ : Command):
+        release.wait(5)
+        return Response("late", Command_.CSVFILE)
+
+    async def main():
+        server = _server(workers=1)
+        server.register("block", blocking_handler)
+        running, queued = _command("block"), _command("block")
+        await server.submit(running)
+        await server.submit(queued)
+        while running.status.status != status.RUNNING:
+            await asyncio.sleep(0.01)
+        assert server.cancel(queued.id)
+        assert server.cancel(running.id)
+        assert not server.cancel(running.id)
+        release.set()
+        await server.wait(running)
+        await server.wait(queued)
+        cancelled = _command("block")
+        task = asyncio.create_task(MCP_InTeract(cancelled, server))
+        while cancelled.id not in server.commands:
+            await asyncio.sleep(0)
+        server.cancel(cancelled.id)
+        with pytest.raises(HTTPException) as exc:
+            await task
+        await server.stop()
+        return server, running, queued, exc.value
+    server, running, queued, exc = asyncio.run(main())
+    assert running.status.status == status.CANCELLED
+    assert running.result is None
+    assert queued.status.status == status.CANCELLED
+    assert queued.started_at is None
+    assert exc.status_code == 409
+    assert server.stats()["cancelled"] == 3
+
+def test_restart_after_stop():
+    async def main():
+        server = _server()
+        await server.wait(await _submitted(server))
+        await server.stop()
+        Command_ = await _submitted(server)
+        await asyncio.wait_for(server.wait(Command_), timeout=2)
+        await server.stop()
+        return Command_
+    assert asyncio.run(main()).status.status == status.SUCCESS
+
+def test_restart_with_external_executor_raises():
+    async def main():
+        server = _server(executor=ThreadPoolExecutor(max_workers=1))
+        await server.wait(await _submitted(server))
+        await server.stop()
+        with pytest.raises(RuntimeError):
+            await server.submit(_command())
+    asyncio.run(main())
+
+def test_broken_executor_fails_command():
+    async def main():
+        executor = ThreadPoolExecutor(max_workers=1)
+        server = _server(executor=executor)
+        await server.start()
+        executor.shutdown()
+        Command_ = await _submitted(server)
+        await asyncio.wait_for(server.wait(Command_), timeout=2)
+        second = await _submitted(server)
+        await asyncio.wait_for(server.wait(second), timeout=2)
+        await server.stop()
+        return Command_, second
+    first, second = asyncio.run(main())
+    assert first.status.status == status.FAILED
+    assert "shutdown" in first.error
+    assert second.status.status == status.FAILED
+
+def test_finished_commands_are_released():
+    async def main():
+        server = _server(history=3)
+        waited = await _submitted(server)
+        await server.wait(waited)
+        assert waited.id not in server.commands
+        unwaited = [await _submitted(server) for _ in range(5)]
+        await server.stop()
+        return server, unwaited
+    server, unwaited = asyncio.run(main())
+    assert len(server.commands) == 3
+    assert [c.id for c in unwaited[-3:]] == list(server.commands)
+    assert server.stats()["submitted"] == 6
+
+def test_throughput_spans_restarts_and_pauses_when_stopped():
+    async def main():
+        server = _server()
+        for _ in range(4):
+            await server.wait(await _submitted(server))
+        await server.stop()
+        stopped = server.stats()["throughput"]
+        await asyncio.sleep(0.05)
+        assert server.stats()["throughput"] == stopped
+        await server.wait(await _submitted(server))
+        await server.stop()
+        return server, stopped
+    server, stopped = asyncio.run(main())
+    assert server.stats()["success"] == 5
+    # 5 条命令 / (第一段 + 第二段运行时间) 不可能超过 5 / 第一段运行时间
+    assert server.stats()["throughput"] <= stopped * 5 / 4
+
+def test_latency_percentiles():
+    server = _server()
+    server._latency.extend(float(i) for i in range(1, 101))
+    stats = server.stats()
+    assert stats["latency_avg"] == 50.5
+    assert stats["latency_p50"] == 51.0
+    assert stats["latency_p95"] == 96.0
+    assert stats["latency_max"] == 100.0
+
+async def _submitted(server : MCP_Server):
+    Command_ = _command()
+    await server.submit(Command_)
+    return Command_
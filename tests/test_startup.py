@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+# 导入耗时基准：只限制 app/show 自身在框架之上增加的导入耗时，且不能加载 torch/pymongo 等重依赖
+# fastapi 等框架的导入耗时取决于机器, 在同一子进程中先导入并扣除
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET = 0.2
+BASELINE_MODULES = ("fastapi", "fastapi.middleware.cors", "pydantic", "loguru")
+HEAVY_MODULES = ("torch", "transformers", "pymongo")
+RUNS = 3
+
+def _measure_once(module : str):
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(BASELINE_MODULES)}\n"
+        "baseline = time.perf_counter()\n"
+        f"import {module}\n"
+        "end = time.perf_counter()\n"
+        "print(baseline - start)\n"
+        "print(end - baseline)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, f"import {module} failed:\n{proc.stderr}"
+    output = proc.stdout.splitlines()
+    return float(output[-3]), float(output[-2]), [m for m in output[-1].split(",") if m]
+
+def measure_import(module : str):
+    """
+    在新进程中导入模块, 多次测量取最短
+
+    Returns:
+        (框架导入耗时, 模块在框架之上增加的导入耗时, 已加载的重依赖)
+    """
+    results = [_measure_once(module) for _ in range(RUNS)]
+    return (
+        min(baseline for baseline, _, _ in results),
+        min(elapsed for _, elapsed, _ in results),
+        results[0][2],
+    )
+
+def test_app_import_time():
+    baseline, elapsed, heavy = measure_import("app")
+    assert elapsed < IMPORT_BUDGET, f"import app added {elapsed:.3f}s on top of {baseline:.3f}s for the framework"
+    assert not heavy, f"import app loaded {heavy}"
+
+def test_show_import_time():
+    baseline, elapsed, heavy = measure_import("show")
+    assert elapsed < IMPORT_BUDGET, f"import show added {elapsed:.3f}s on top of {baseline:.3f}s for the framework"
+    assert not heavy, f"import show loaded {heavy}"
+
+if __name__ == "__main__":
+    for module in ("app", "show"):
+        baseline, elapsed, heavy = measure_import(module)
+        print(f"import {module}: {elapsed:.3f}s (framework {baseline:.3f}s), heavy modules: {heavy or 'none'}")